@@ -0,0 +1,182 @@
+import asyncio
+import bisect
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from remover import BackgroundRemover
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed bucket histogram in seconds, the last bucket catches everything above."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"le_{b}" for b in self.buckets] + ["inf"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "mean_s": round(self.total / self.count, 4) if self.count else 0.0,
+            }
+
+
+class AsyncBackgroundRemover:
+    """asyncio front end for BackgroundRemover that never blocks the event loop.
+
+    Blocking work runs on an owned executor, at most ``concurrency`` requests
+    run at once, and identical requests already in flight share one result.
+    """
+
+    def __init__(self, remover=None, concurrency=2, timeout=None):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.remover = remover or BackgroundRemover()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.latency = Histogram()
+        self.queue_wait = Histogram()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="removebg")
+        self._semaphore = None
+        self._inflight = {}
+        self._waiting = 0
+        self._running = 0
+        self._coalesced = 0
+        self._timeouts = 0
+        self._cancelled = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _key(image, model):
+        # Only inputs that are cheap to identify are coalesced, decoded images never are
+        if isinstance(image, (bytes, bytearray)):
+            return ("bytes", hashlib.blake2b(image, digest_size=16).digest(), model)
+        if isinstance(image, (str, Path)):
+            return ("path", str(Path(image).resolve()), model)
+        return None
+
+    async def remove(self, image, model=None, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        key = self._key(image, model)
+        entry = self._inflight.get(key) if key is not None else None
+        if entry is not None and (entry[0].done() or entry[0].cancelling()):
+            # Never hand a new caller a task that is finished or being torn down
+            entry = None
+        if entry is None:
+            entry = [asyncio.ensure_future(self._run(image, model)), 0]
+            if key is not None:
+                self._inflight[key] = entry
+                entry[0].add_done_callback(lambda _, k=key, e=entry: self._forget(k, e))
+        else:
+            self._coalesced += 1
+
+        entry[1] += 1
+        try:
+            # Shield so one caller timing out or cancelling does not kill work others await
+            return await asyncio.wait_for(asyncio.shield(entry[0]), timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self._cancelled += 1
+            raise
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                # Nobody is waiting any more; this drops the request if it is still
+                # queued on the semaphore, submitted work keeps its slot until done.
+                # Forget it now, the done callback only runs on a later loop iteration
+                if key is not None:
+                    self._forget(key, entry)
+                entry[0].cancel()
+
+    def _forget(self, key, entry):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    async def _run(self, image, model):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        queued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        self.queue_wait.observe(time.perf_counter() - queued)
+        depth = self._waiting // self.concurrency
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, self.remover.remove, image, model, depth)
+        except BaseException:
+            self._release(queued)
+            raise
+        # Cancelling us cannot stop the worker thread, so the slot is held until it really finishes
+        future.add_done_callback(lambda _: self._release(queued))
+        return await asyncio.shield(future)
+
+    def _release(self, queued):
+        self._running -= 1
+        self._semaphore.release()
+        self.latency.observe(time.perf_counter() - queued)
+
+    async def remove_many(self, images, model=None):
+        """Async generator over an (async) iterable, yielding results in input order."""
+        pending = []
+        try:
+            async for image in _aiter(images):
+                pending.append(asyncio.ensure_future(self.remove(image, model)))
+                if len(pending) >= self.remover.prefetch:
+                    yield await pending.pop(0)
+            while pending:
+                yield await pending.pop(0)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def metrics(self):
+        return {
+            "running": self._running,
+            "waiting": self._waiting,
+            "coalesced": self._coalesced,
+            "timeouts": self._timeouts,
+            "cancelled": self._cancelled,
+            "latency": self.latency.snapshot(),
+            "queue_wait": self.queue_wait.snapshot(),
+            "remover": self.remover.metrics(),
+        }
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
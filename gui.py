@@ -3,43 +3,91 @@ import os
 from pathlib import Path
 from PIL import Image
 import io
-from rembg import remove
+import json
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QComboBox, QFileDialog, QProgressBar, QMessageBox,
-    QFrame, QScrollArea
+    QFrame, QScrollArea, QRubberBand
 )
-from PyQt6.QtGui import QPixmap, QIcon, QFont, QColor, QDragEnterEvent, QDropEvent, QLinearGradient
+from PyQt6.QtGui import QPixmap, QImage, QIcon, QFont, QColor, QDragEnterEvent, QDropEvent, QLinearGradient
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QRect
 from PyQt6.QtCore import QTimer
 
+from memory import (
+    PRIORITY_HIGH, PRIORITY_LOW, MemoryBudget, image_bytes, restore_image, spill_image
+)
+from profiling import Profiler, format_summary
+from remover import BackgroundRemover
+from router import AUTO_MODEL
+from triage import ALPHA, COLOR_KEY, DUPLICATE
+from touchup import refine_region
+from thumbnails import cached_thumbnail, read_thumbnail
+
 
 class RemoveBackgroundThread(QThread):
     finished = pyqtSignal(Image.Image)
     error = pyqtSignal(str)
     progress = pyqtSignal(int)
+    model_selected = pyqtSignal(str)
 
-    def __init__(self, image_path, model_name):
+    def __init__(self, image_path, model_name, remover=None):
         super().__init__()
         self.image_path = image_path
         self.model_name = model_name
+        self.remover = remover or BackgroundRemover()
 
     def run(self):
         try:
             self.progress.emit(20)
-            img = Image.open(self.image_path)
+            img = self.remover.load(self.image_path)
             self.progress.emit(40)
-            # Use session API for model selection
-            from rembg.session_factory import new_session
-            session = new_session(self.model_name)
-            self.progress.emit(60)
-            result = remove(img, session=session)
+            result = self.remover.remove(img, model=self.model_name)
+            self.model_selected.emit(result.info["rembg_model"])
             self.progress.emit(100)
             self.finished.emit(result)
         except Exception as e:
             self.error.emit(str(e))
 
 
+class ThumbnailThread(QThread):
+    finished = pyqtSignal(str, QImage)
+    error = pyqtSignal(str, str)
+
+    def __init__(self, file_path, width):
+        super().__init__()
+        self.file_path = file_path
+        self.width = width
+
+    def run(self):
+        try:
+            self.finished.emit(self.file_path, read_thumbnail(self.file_path, self.width))
+        except Exception as e:
+            self.error.emit(self.file_path, str(e))
+
+
+class TouchUpThread(QThread):
+    finished = pyqtSignal(Image.Image)
+    error = pyqtSignal(str)
+
+    def __init__(self, source, result, box, model_name, remover):
+        super().__init__()
+        # source is a path on the first touch-up, then the decoded image is reused
+        self.source = source
+        self.result = result
+        self.box = box
+        self.model_name = model_name
+        self.remover = remover
+
+    def run(self):
+        try:
+            self.source = self.remover.load(self.source)
+            session = self.remover.session(self.model_name)
+            _, result = refine_region(self.source, self.result.getchannel("A"), self.box, session)
+            self.finished.emit(result)
+        except Exception as e:
+            self.error.emit(str(e))
+
+
 class ModernImageLabel(QLabel):
     image_dropped = pyqtSignal(str)
 
@@ -110,6 +158,8 @@ class ModernImageLabel(QLabel):
 
 
 class BackgroundRemovalGUI(QMainWindow):
+    evict_requested = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Background Remover Pro - AI Powered")
@@ -118,10 +168,30 @@ class BackgroundRemovalGUI(QMainWindow):
         self.current_image_path = None
         self.current_result_image = None
         self.removal_thread = None
+        self.touchup_thread = None
+        self.thumbnail_threads = []
+        self.current_source = None
+        self.current_source_path = None
+        self.spilled_result_path = None
+        self.last_model_name = None
+        self.memory = MemoryBudget()
+        # MemoryBudget evicts on whichever thread registers, GUI state only changes on this one
+        self.evict_requested.connect(lambda evict: evict(), Qt.ConnectionType.QueuedConnection)
+        # `python gui.py --profile` records operator traces for every run of the session
+        profiler = Profiler() if "--profile" in sys.argv else None
+        self.remover = BackgroundRemover(memory=self.memory, triage=profiler is None, profiler=profiler)
         
         self.init_ui()
         self.apply_dark_theme()
 
+        self.memory_label = QLabel()
+        self.memory_label.setStyleSheet("color: #888; font-size: 10px; padding: 0 8px;")
+        self.statusBar().addPermanentWidget(self.memory_label)
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.update_memory_status)
+        self.memory_timer.start(2000)
+        self.update_memory_status()
+
     def init_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -176,6 +246,7 @@ class BackgroundRemovalGUI(QMainWindow):
 
         self.model_combo = QComboBox()
         self.model_combo.addItems([
+            AUTO_MODEL,
             "u2net",
             "u2netp",
             "u2net_human_seg",
@@ -312,6 +383,35 @@ class BackgroundRemovalGUI(QMainWindow):
         """)
         left_layout.addWidget(self.export_btn)
 
+        # Touch-up Button
+        self.touchup_btn = QPushButton("🖌️ Touch Up Region")
+        self.touchup_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Bold))
+        self.touchup_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.touchup_btn.setCheckable(True)
+        self.touchup_btn.setMinimumHeight(40)
+        self.touchup_btn.setEnabled(False)
+        self.touchup_btn.setToolTip("Drag a box over a wrong area of the preview to re-run only that region")
+        self.touchup_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #1a2332;
+                color: #e0e0e0;
+                border: 1px solid #1a9fff;
+                border-radius: 8px;
+                font-weight: bold;
+                padding: 8px;
+            }
+            QPushButton:checked {
+                background-color: #1a9fff;
+                color: white;
+            }
+            QPushButton:disabled {
+                background-color: #3d3d3d;
+                border-color: #3d3d3d;
+                color: #888;
+            }
+        """)
+        left_layout.addWidget(self.touchup_btn)
+
         # Status Label
         self.status_label = QLabel("✓ Ready to process images")
         self.status_label.setStyleSheet("color: #00d4ff; font-size: 11px; font-weight: 500; margin-top: 5px;")
@@ -361,6 +461,11 @@ class BackgroundRemovalGUI(QMainWindow):
             }
         """)
         self.result_label.setMinimumSize(500, 600)
+        self.result_label.mousePressEvent = self.on_result_press
+        self.result_label.mouseMoveEvent = self.on_result_move
+        self.result_label.mouseReleaseEvent = self.on_result_release
+        self.rubber_band = QRubberBand(QRubberBand.Shape.Rectangle, self.result_label)
+        self.rubber_origin = None
         result_container_layout.addWidget(self.result_label)
         
         right_layout.addWidget(result_container)
@@ -396,22 +501,43 @@ class BackgroundRemovalGUI(QMainWindow):
             self.load_image(file_path)
 
     def load_image(self, file_path):
-        try:
-            self.current_image_path = file_path
-            self.image_input.image_file_path = file_path
-            pixmap = QPixmap(file_path)
-            
-            scaled_pixmap = pixmap.scaledToWidth(140, Qt.TransformationMode.SmoothTransformation)
-            self.image_input.setPixmap(scaled_pixmap)
-            self.image_input.setText("")
-            
-            self.status_label.setText(f"✓ Loaded: {Path(file_path).name}")
-            self.status_label.setStyleSheet("color: #00d4ff; font-size: 11px; font-weight: 500;")
-            self.remove_btn.setEnabled(True)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to load image: {str(e)}")
-            self.status_label.setText("✗ Error loading image")
-            self.status_label.setStyleSheet("color: #ff6b6b; font-size: 11px; font-weight: 500;")
+        self.current_image_path = file_path
+        self.image_input.image_file_path = file_path
+
+        # Decoding is done at thumbnail size off the UI thread, big files never stall the window
+        thumbnail = cached_thumbnail(file_path, 140)
+        if thumbnail is not None:
+            self.on_thumbnail_ready(file_path, thumbnail)
+            return
+
+        self.image_input.clear()
+        self.image_input.setText("⏳ Loading preview...")
+        # Earlier loads may still be decoding, keep them referenced until they stop
+        self.thumbnail_threads = [t for t in self.thumbnail_threads if t.isRunning()]
+        thumbnail_thread = ThumbnailThread(file_path, 140)
+        thumbnail_thread.finished.connect(self.on_thumbnail_ready)
+        thumbnail_thread.error.connect(self.on_thumbnail_error)
+        self.thumbnail_threads.append(thumbnail_thread)
+        thumbnail_thread.start()
+
+    def on_thumbnail_ready(self, file_path, thumbnail):
+        if file_path != self.current_image_path:
+            return
+        self.image_input.setPixmap(QPixmap.fromImage(thumbnail))
+        self.image_input.setText("")
+
+        self.status_label.setText(f"✓ Loaded: {Path(file_path).name}")
+        self.status_label.setStyleSheet("color: #00d4ff; font-size: 11px; font-weight: 500;")
+        self.remove_btn.setEnabled(True)
+
+    def on_thumbnail_error(self, file_path, error_msg):
+        if file_path != self.current_image_path:
+            return
+        self.current_image_path = None
+        self.image_input.setText("📁 Drag & Drop Image\nor Click to Browse")
+        QMessageBox.critical(self, "Error", f"Failed to load image: {error_msg}")
+        self.status_label.setText("✗ Error loading image")
+        self.status_label.setStyleSheet("color: #ff6b6b; font-size: 11px; font-weight: 500;")
 
     def remove_background(self):
         if not self.current_image_path:
@@ -422,46 +548,194 @@ class BackgroundRemovalGUI(QMainWindow):
 
         self.remove_btn.setEnabled(False)
         self.export_btn.setEnabled(False)
+        self.touchup_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.status_label.setText(f"⏳ Processing with {model_name}...")
         self.status_label.setStyleSheet("color: #ffaa00; font-size: 11px; font-weight: 500;")
 
-        self.removal_thread = RemoveBackgroundThread(self.current_image_path, model_name)
+        self.removal_thread = RemoveBackgroundThread(self.current_image_path, model_name, self.remover)
         self.removal_thread.finished.connect(self.on_removal_finished)
         self.removal_thread.error.connect(self.on_removal_error)
         self.removal_thread.progress.connect(self.progress_bar.setValue)
+        self.removal_thread.model_selected.connect(self.on_model_selected)
         self.removal_thread.start()
 
+    def on_model_selected(self, model_name):
+        self.last_model_name = model_name
+
     def on_removal_finished(self, result_image):
-        self.current_result_image = result_image
-        
-        # Convert PIL image to QPixmap
-        img_byte_arr = io.BytesIO()
-        result_image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        pixmap = QPixmap()
-        pixmap.loadFromData(img_byte_arr.getvalue())
-        
-        # Scale to fit label
-        scaled_pixmap = pixmap.scaledToWidth(480, Qt.TransformationMode.SmoothTransformation)
-        self.result_label.setPixmap(scaled_pixmap)
+        # The user may have loaded another file while this one was processing
+        self.set_source(self.removal_thread.image_path)
+        self.set_result(result_image)
         
         self.progress_bar.setVisible(False)
         self.remove_btn.setEnabled(True)
         self.export_btn.setEnabled(True)
-        self.status_label.setText("✓ Background removed successfully!")
+        self.touchup_btn.setEnabled(True)
+        if self.last_model_name in (ALPHA, COLOR_KEY, DUPLICATE):
+            self.status_label.setText(f"⚡ Fast path: {self.last_model_name}, model skipped")
+        elif self.model_combo.currentText() == AUTO_MODEL:
+            self.status_label.setText(f"✓ Background removed with {AUTO_MODEL} → {self.last_model_name}")
+        else:
+            self.status_label.setText("✓ Background removed successfully!")
+        # Router decisions and fitted cost curves, hover the model picker to see them
+        metrics = self.remover.metrics()
+        self.model_combo.setToolTip(json.dumps(metrics["router"], indent=2))
+        self.status_label.setToolTip("Triage: " + json.dumps(metrics["triage"]))
+        self.status_label.setStyleSheet("color: #00ff88; font-size: 11px; font-weight: 500;")
+
+    def show_result(self, result_image):
+        # Scale in PIL first so no full-size PNG or QPixmap copy is ever made
+        height = max(1, round(result_image.height * 480 / result_image.width))
+        preview = result_image.convert("RGBA").resize((480, height), Image.Resampling.LANCZOS)
+        qimage = QImage(preview.tobytes("raw", "RGBA"), 480, height, QImage.Format.Format_RGBA8888)
+        self.result_label.setPixmap(QPixmap.fromImage(qimage))
+        self.memory.register("preview", 480 * height * 4)
+
+    def set_result(self, result_image):
+        self.current_result_image = result_image
+        self.discard_spilled_result()
+        self.show_result(result_image)
+        self.register_result(result_image)
+
+    def register_result(self, result_image):
+        self.memory.register("result", image_bytes(result_image), PRIORITY_HIGH,
+                             lambda: self.evict_requested.emit(lambda: self.spill_result(result_image)))
+
+    def set_source(self, source):
+        self.current_source = source
+        if isinstance(source, Image.Image):
+            # A decoded source is only a speed-up for touch-ups, fall back to the path
+            path = self.current_source_path
+            self.memory.register("source", image_bytes(source), PRIORITY_LOW,
+                                 lambda: self.evict_requested.emit(lambda: self.drop_source(source, path)))
+        else:
+            self.current_source_path = source
+            self.memory.release("source")
+
+    def drop_source(self, source, path):
+        # Queued evictions can arrive after a newer source was set, leave that one alone
+        if self.current_source is source:
+            self.current_source = path
+
+    def spill_result(self, image):
+        if self.current_result_image is image:
+            self.spilled_result_path = spill_image(image)
+            self.current_result_image = None
+
+    def discard_spilled_result(self):
+        if self.spilled_result_path:
+            os.remove(self.spilled_result_path)
+            self.spilled_result_path = None
+
+    def result_image(self):
+        if self.current_result_image is None and self.spilled_result_path:
+            path, self.spilled_result_path = self.spilled_result_path, None
+            self.current_result_image = restore_image(path)
+            self.register_result(self.current_result_image)
+        else:
+            self.memory.touch("result")
+        return self.current_result_image
+
+    def has_result(self):
+        return self.current_result_image is not None or self.spilled_result_path is not None
+
+    def closeEvent(self, event):
+        # A result spilled to disk would otherwise outlive the app in the temp dir
+        self.discard_spilled_result()
+        for summary in self.remover.finish_profiling().values():
+            print(format_summary(summary))
+        super().closeEvent(event)
+
+    def update_memory_status(self):
+        metrics = self.memory.metrics()
+        self.memory_label.setText(
+            f"🧠 Memory: {metrics['used_bytes'] / 2**20:.0f} / {metrics['limit_bytes'] / 2**20:.0f} MB"
+            f"  ·  {metrics['evictions']} evicted"
+        )
+
+    def on_result_press(self, event):
+        if not self.touchup_btn.isChecked() or not self.has_result():
+            return
+        if self.touchup_thread and self.touchup_thread.isRunning():
+            return
+        self.rubber_origin = event.position().toPoint()
+        self.rubber_band.setGeometry(QRect(self.rubber_origin, QSize()))
+        self.rubber_band.show()
+
+    def on_result_move(self, event):
+        if self.rubber_origin is not None:
+            self.rubber_band.setGeometry(QRect(self.rubber_origin, event.position().toPoint()).normalized())
+
+    def on_result_release(self, event):
+        if self.rubber_origin is None:
+            return
+        rect = QRect(self.rubber_origin, event.position().toPoint()).normalized()
+        self.rubber_origin = None
+        self.rubber_band.hide()
+
+        box = self.preview_rect_to_image_box(rect)
+        if box is None:
+            return
+        self.touch_up_region(box)
+
+    def preview_rect_to_image_box(self, rect):
+        pixmap = self.result_label.pixmap()
+        result_image = self.result_image() if self.has_result() else None
+        if pixmap is None or pixmap.isNull() or result_image is None:
+            return None
+        # The preview is centred inside the label and scaled down from the full image
+        contents = self.result_label.contentsRect()
+        off_x = contents.x() + (contents.width() - pixmap.width()) / 2
+        off_y = contents.y() + (contents.height() - pixmap.height()) / 2
+        scale = result_image.width / pixmap.width()
+        width, height = result_image.size
+
+        x0 = min(max(int((rect.left() - off_x) * scale), 0), width)
+        y0 = min(max(int((rect.top() - off_y) * scale), 0), height)
+        x1 = min(max(int((rect.right() - off_x) * scale), 0), width)
+        y1 = min(max(int((rect.bottom() - off_y) * scale), 0), height)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return (x0, y0, x1, y1)
+
+    def touch_up_region(self, box):
+        model_name = self.last_model_name
+        if model_name in (None, ALPHA, COLOR_KEY, DUPLICATE):
+            # Fast-path results have no model behind them, refine with the best one
+            model_name = self.remover.router.candidates[0]
+
+        self.remove_btn.setEnabled(False)
+        self.touchup_btn.setEnabled(False)
+        self.status_label.setText(f"⏳ Touching up region with {model_name}...")
+        self.status_label.setStyleSheet("color: #ffaa00; font-size: 11px; font-weight: 500;")
+
+        self.touchup_thread = TouchUpThread(self.current_source, self.result_image(), box, model_name, self.remover)
+        self.touchup_thread.finished.connect(self.on_touchup_finished)
+        self.touchup_thread.error.connect(self.on_removal_error)
+        self.touchup_thread.start()
+
+    def on_touchup_finished(self, result_image):
+        # Keep the decoded source so the next touch-up starts warm
+        self.set_source(self.touchup_thread.source)
+        self.set_result(result_image)
+
+        self.remove_btn.setEnabled(True)
+        self.touchup_btn.setEnabled(True)
+        self.status_label.setText("✓ Region touched up")
         self.status_label.setStyleSheet("color: #00ff88; font-size: 11px; font-weight: 500;")
 
     def on_removal_error(self, error_msg):
         QMessageBox.critical(self, "Processing Error", f"Error: {error_msg}")
         self.progress_bar.setVisible(False)
         self.remove_btn.setEnabled(True)
+        self.touchup_btn.setEnabled(self.has_result())
         self.status_label.setText(f"✗ Error: {error_msg[:50]}")
         self.status_label.setStyleSheet("color: #ff6b6b; font-size: 11px; font-weight: 500;")
 
     def export_image(self):
-        if not self.current_result_image:
+        if not self.has_result():
             QMessageBox.warning(self, "Warning", "No processed image to export")
             return
 
@@ -471,7 +745,7 @@ class BackgroundRemovalGUI(QMainWindow):
         
         if file_path:
             try:
-                self.current_result_image.save(file_path)
+                self.result_image().save(file_path)
                 QMessageBox.information(self, "✓ Success", f"Image exported successfully!\n{file_path}")
                 self.status_label.setText(f"✓ Exported: {Path(file_path).name}")
                 self.status_label.setStyleSheet("color: #00ff88; font-size: 11px; font-weight: 500;")
@@ -1,12 +1,91 @@
-from rembg import remove
-from PIL import Image
+import argparse
+import json
+from pathlib import Path
 
-input_path = "j.png"
-output_path = "output2.png"
+from masks import FORMATS, RGBA, apply_mask, read_mask, save_output
+from profiling import Profiler, format_summary
+from remover import BackgroundRemover
+from router import AUTO_MODEL
 
-img = Image.open(input_path)
-result = remove(img)
 
-result.save(output_path)
+def output_paths(inputs, output, batch):
+    if not batch:
+        return [Path(output)] * len(inputs)
+    # Same stem from different folders would overwrite each other, number the later ones
+    names = {}
+    used = set()
+    paths = []
+    for input_path in inputs:
+        key = Path(input_path).resolve()
+        if key not in names:
+            stem = Path(input_path).stem
+            name, index = stem, 1
+            while name in used:
+                name = f"{stem}-{index}"
+                index += 1
+            if name != stem:
+                print(f"⚠️ {input_path}: output name taken, writing {name}.png")
+            used.add(name)
+            names[key] = name
+        paths.append(Path(output) / f"{names[key]}.png")
+    return paths
 
-print("🔥 HQ background removed:", output_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove image backgrounds")
+    parser.add_argument("inputs", nargs="*", default=["j.png"])
+    parser.add_argument("-o", "--output", default="output2.png",
+                        help="output file for a single input, or output directory for a batch")
+    parser.add_argument("-m", "--model", default="u2net",
+                        help=f"rembg model name, or '{AUTO_MODEL}' to route by --budget")
+    parser.add_argument("--budget", type=float, default=3.0,
+                        help="latency budget in seconds per image for the auto model")
+    parser.add_argument("--no-triage", action="store_true",
+                        help="always run the model, even on pre-cut, flat-backdrop or duplicate inputs")
+    parser.add_argument("--workers", type=int, default=2, help="images processed concurrently")
+    parser.add_argument("--prefetch", type=int, default=4, help="images decoded ahead of the writer")
+    parser.add_argument("--profile", action="store_true",
+                        help="record ONNX Runtime operator traces and Python samples per model")
+    parser.add_argument("--profile-dir", default="profiles", metavar="DIR",
+                        help="where --profile writes its traces and summaries")
+    parser.add_argument("--runs", type=int, default=1, help="process the inputs this many times")
+    parser.add_argument("-f", "--format", choices=FORMATS, default=RGBA,
+                        help="rgba cutout, 8-bit mask, 1-bit packed mask, or COCO RLE json sidecar")
+    parser.add_argument("--apply-mask", metavar="MASK",
+                        help="skip the model and cut the input out with a previously written mask")
+    args = parser.parse_args()
+
+    if args.apply_mask:
+        # Same EXIF orientation the mask was produced under
+        img = BackgroundRemover.load(args.inputs[0])
+        apply_mask(img, read_mask(args.apply_mask)).save(args.output)
+        print("🔥 Mask applied:", args.output)
+        return
+
+    # Triage would serve repeated profiling runs from its duplicate cache, skip it
+    remover = BackgroundRemover(model=args.model, budget=args.budget, triage=not (args.no_triage or args.profile),
+                                prefetch=args.prefetch, workers=args.workers,
+                                profiler=Profiler(args.profile_dir) if args.profile else None)
+    batch = len(args.inputs) > 1
+    if batch:
+        Path(args.output).mkdir(parents=True, exist_ok=True)
+
+    inputs = args.inputs * args.runs
+    for output_path, result in zip(output_paths(inputs, args.output, batch), remover.remove_many(inputs)):
+        written = save_output(result, output_path, args.format)
+        print(f"🔥 HQ background removed ({result.info['rembg_model']}):", written)
+
+    for summary in remover.finish_profiling().values():
+        print(format_summary(summary))
+    if args.profile:
+        print("Profiles written to:", args.profile_dir)
+
+    metrics = remover.metrics()
+    if args.model == AUTO_MODEL:
+        print(json.dumps(metrics["router"], indent=2))
+    if metrics["triage"] is not None:
+        print("Triage:", json.dumps(metrics["triage"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+
+RGBA = "rgba"
+MASK = "mask"
+MASK_1BIT = "mask1"
+RLE = "rle"
+FORMATS = (RGBA, MASK, MASK_1BIT, RLE)
+
+
+def alpha_array(result):
+    if result.mode == "L":
+        return np.asarray(result)
+    return np.asarray(result.getchannel("A"))
+
+
+def pack_mask(alpha, threshold=128):
+    # PIL mode "1" rows are MSB-first bits padded to whole bytes, which is exactly packbits
+    bits = np.packbits(alpha >= threshold, axis=1)
+    return Image.frombytes("1", (alpha.shape[1], alpha.shape[0]), bits.tobytes())
+
+
+def rle_counts(alpha, threshold=128):
+    # COCO order: column-major, runs alternate starting with background
+    flat = (alpha >= threshold).ravel(order="F")
+    edges = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], edges, [flat.size])))
+    if flat.size and flat[0]:
+        counts = np.concatenate(([0], counts))
+    return counts.tolist()
+
+
+def counts_to_string(counts):
+    # Same compact LEB128-style string pycocotools writes
+    out = []
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            out.append(chr(c + 48))
+    return "".join(out)
+
+
+def string_to_counts(s):
+    counts = []
+    p = 0
+    while p < len(s):
+        x = 0
+        k = 0
+        more = True
+        while more:
+            c = ord(s[p]) - 48
+            x |= (c & 0x1F) << (5 * k)
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and c & 0x10:
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
+def encode_rle(alpha, threshold=128):
+    return {"size": [int(alpha.shape[0]), int(alpha.shape[1])],
+            "counts": counts_to_string(rle_counts(alpha, threshold))}
+
+
+def decode_rle(rle):
+    height, width = rle["size"]
+    counts = rle["counts"]
+    if isinstance(counts, str):
+        counts = string_to_counts(counts)
+    values = np.where(np.arange(len(counts)) % 2, 255, 0).astype(np.uint8)
+    flat = np.repeat(values, counts)
+    return flat.reshape((width, height)).T
+
+
+def save_output(result, path, fmt=RGBA, threshold=128):
+    """Write result in the requested format and return the path actually written."""
+    path = Path(path)
+    if fmt == RGBA:
+        result.save(path)
+        return path
+
+    alpha = alpha_array(result)
+    if fmt == MASK:
+        Image.fromarray(alpha, "L").save(path.with_suffix(".png"))
+        return path.with_suffix(".png")
+    if fmt == MASK_1BIT:
+        pack_mask(alpha, threshold).save(path.with_suffix(".png"), optimize=True)
+        return path.with_suffix(".png")
+    if fmt == RLE:
+        sidecar = path.with_suffix(".rle.json")
+        with open(sidecar, "w") as f:
+            json.dump(encode_rle(alpha, threshold), f)
+        return sidecar
+    raise ValueError(f"Unknown output format: {fmt}")
+
+
+def read_mask(path):
+    """Load any mask format written by save_output as an 8-bit array."""
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path) as f:
+            return decode_rle(json.load(f))
+    mask = Image.open(path)
+    if mask.mode in ("RGBA", "LA"):
+        return np.asarray(mask.getchannel("A"))
+    # Mode "1" converts to 0/255 directly
+    return np.asarray(mask.convert("L"))
+
+
+def apply_mask(img, mask):
+    if isinstance(mask, np.ndarray):
+        mask = Image.fromarray(mask, "L")
+    if mask.size != img.size:
+        raise ValueError(f"Mask size {mask.size} does not match image size {img.size}")
+    result = img.convert("RGBA")
+    result.putalpha(mask)
+    return result
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+
+DEFAULT_BUDGET_MB = int(os.environ.get("REMOVEBG_MEMORY_MB", "1024"))
+
+# Rough resident size of a loaded ONNX session, weights plus runtime arenas
+SESSION_BYTES = {
+    "u2net": 220 << 20,
+    "u2net_human_seg": 220 << 20,
+    "isnet-general-use": 230 << 20,
+    "u2netp": 15 << 20,
+    "silueta": 60 << 20,
+}
+DEFAULT_SESSION_BYTES = 220 << 20
+
+
+def image_bytes(img):
+    if img is None:
+        return 0
+    return img.width * img.height * len(img.getbands())
+
+
+def spill_image(img):
+    # Fast compression, spilled images only need to round trip locally
+    fd, path = tempfile.mkstemp(prefix="removebg-", suffix=".png")
+    with os.fdopen(fd, "wb") as f:
+        img.save(f, format="PNG", compress_level=1)
+    return path
+
+
+def restore_image(path):
+    img = Image.open(path)
+    img.load()
+    os.remove(path)
+    return img
+
+
+class MemoryBudget:
+    """Accounts for large objects and evicts the least important ones when over budget.
+
+    Entries registered without an evict callback are counted but never evicted.
+    Eviction order is lowest priority first, then least recently used.
+    """
+
+    def __init__(self, limit_bytes=DEFAULT_BUDGET_MB << 20):
+        self.limit_bytes = limit_bytes
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def register(self, key, nbytes, priority=PRIORITY_NORMAL, evict=None):
+        with self._lock:
+            self._entries[key] = [nbytes, priority, time.monotonic(), evict]
+        self.enforce(keep=key)
+
+    def touch(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] = time.monotonic()
+
+    def release(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def usage(self):
+        with self._lock:
+            return sum(entry[0] for entry in self._entries.values())
+
+    def enforce(self, keep=None):
+        victims = []
+        with self._lock:
+            used = sum(entry[0] for entry in self._entries.values())
+            candidates = sorted(
+                (entry[1], entry[2], key) for key, entry in self._entries.items()
+                if entry[3] is not None and key != keep
+            )
+            for _, _, key in candidates:
+                if used <= self.limit_bytes:
+                    break
+                nbytes, _, _, evict = self._entries.pop(key)
+                used -= nbytes
+                victims.append(evict)
+                self._evictions += 1
+        # Callbacks may take locks of their own, run them outside ours
+        for evict in victims:
+            evict()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "used_bytes": sum(entry[0] for entry in self._entries.values()),
+                "limit_bytes": self.limit_bytes,
+                "entries": len(self._entries),
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,171 @@
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import onnxruntime as ort
+from rembg.sessions import sessions_class
+
+
+class Profiler:
+    """ONNX Runtime operator profiling plus a Python stack sampler, summarised per model.
+
+    ORT writes one Chrome-trace JSON per session into ``out_dir``; ``finish()``
+    adds a ``<model>-profile.json`` summary of the top operators and Python
+    hot spots next to it.
+    """
+
+    def __init__(self, out_dir="profiles", interval=0.005, top=15):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.top = top
+        os.makedirs(out_dir, exist_ok=True)
+        self._traces = {}
+        self._options = {}
+        self._tags = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample_loop, name="removebg-sampler", daemon=True)
+        self._thread.start()
+
+    def new_session(self, model_name):
+        opts = ort.SessionOptions()
+        opts.enable_profiling = True
+        opts.profile_file_prefix = os.path.join(self.out_dir, f"{model_name}-ort")
+        if "OMP_NUM_THREADS" in os.environ:
+            opts.inter_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
+            opts.intra_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
+        self._options[model_name] = {
+            "intra_op_num_threads": opts.intra_op_num_threads,
+            "inter_op_num_threads": opts.inter_op_num_threads,
+            "execution_mode": str(opts.execution_mode),
+        }
+        # Same lookup rembg's new_session does, but with our session options
+        for session_class in sessions_class:
+            if session_class.name() == model_name:
+                return session_class(model_name, opts)
+        raise ValueError(f"Unknown model: {model_name}")
+
+    def collect(self, model_name, session):
+        trace = session.inner_session.end_profiling()
+        if trace:
+            with self._lock:
+                self._traces.setdefault(model_name, []).append(trace)
+
+    @contextmanager
+    def tagged(self, model_name):
+        # Samples from this thread are charged to model_name while inside the block
+        ident = threading.get_ident()
+        with self._lock:
+            self._tags[ident] = model_name
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._tags.pop(ident, None)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, model_name in self._tags.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    stats = self._samples.setdefault(
+                        model_name, {"samples": 0, "self": Counter(), "total": Counter()})
+                    stats["samples"] += 1
+                    stats["self"][_where(frame)] += 1
+                    seen = set()
+                    while frame is not None:
+                        where = _where(frame)
+                        if where not in seen:
+                            seen.add(where)
+                            stats["total"][where] += 1
+                        frame = frame.f_back
+
+    def finish(self):
+        self._stop.set()
+        self._thread.join()
+        summaries = {}
+        with self._lock:
+            models = set(self._traces) | set(self._samples)
+            for model_name in sorted(models):
+                summary = {
+                    "model": model_name,
+                    "session_options": self._options.get(model_name),
+                    "traces": self._traces.get(model_name, []),
+                    "operators": summarize_ort_traces(self._traces.get(model_name, []), self.top),
+                    "python": summarize_samples(self._samples.get(model_name), self.interval, self.top),
+                }
+                path = os.path.join(self.out_dir, f"{model_name}-profile.json")
+                with open(path, "w") as f:
+                    json.dump(summary, f, indent=2)
+                summaries[model_name] = summary
+        return summaries
+
+
+def _where(frame):
+    code = frame.f_code
+    filename = os.sep.join(code.co_filename.split(os.sep)[-2:])
+    return f"{filename}:{code.co_firstlineno} {code.co_name}"
+
+
+def summarize_ort_traces(paths, top=15):
+    op_us = Counter()
+    op_calls = Counter()
+    runs = 0
+    run_us = 0
+    for path in paths:
+        with open(path) as f:
+            events = json.load(f)
+        for event in events:
+            if event.get("cat") == "Session" and event.get("name") == "model_run":
+                runs += 1
+                run_us += event.get("dur", 0)
+            elif event.get("cat") == "Node" and event.get("name", "").endswith("_kernel_time"):
+                op = event.get("args", {}).get("op_name", event["name"])
+                op_us[op] += event.get("dur", 0)
+                op_calls[op] += 1
+
+    kernel_us = sum(op_us.values())
+    return {
+        "runs": runs,
+        "mean_run_ms": round(run_us / runs / 1000, 2) if runs else 0.0,
+        "kernel_ms": round(kernel_us / 1000, 2),
+        "top": [
+            {"op": op, "ms": round(us / 1000, 2), "pct": round(100 * us / kernel_us, 1), "calls": op_calls[op]}
+            for op, us in op_us.most_common(top)
+        ],
+    }
+
+
+def summarize_samples(stats, interval, top=15):
+    if not stats:
+        return {"samples": 0, "self": [], "total": []}
+    samples = stats["samples"]
+
+    def rows(counter):
+        return [
+            {"where": where, "ms": round(count * interval * 1000, 1), "pct": round(100 * count / samples, 1)}
+            for where, count in counter.most_common(top)
+        ]
+
+    return {"samples": samples, "self": rows(stats["self"]), "total": rows(stats["total"])}
+
+
+def format_summary(summary, rows=5):
+    ops = summary["operators"]
+    lines = [
+        f"== {summary['model']}: {ops['runs']} runs, {ops['mean_run_ms']} ms/run, "
+        f"{ops['kernel_ms']} ms in kernels",
+        "  top operators:",
+    ]
+    lines += [f"    {row['pct']:5.1f}%  {row['ms']:9.1f} ms  {row['op']}" for row in ops["top"][:rows]]
+    lines.append("  python hot spots (self):")
+    lines += [f"    {row['pct']:5.1f}%  {row['ms']:9.1f} ms  {row['where']}"
+              for row in summary["python"]["self"][:rows]]
+    return "\n".join(lines)
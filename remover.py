@@ -0,0 +1,148 @@
+import io
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+from PIL import Image, ImageOps
+from rembg import remove
+from rembg.session_factory import new_session
+
+from memory import DEFAULT_SESSION_BYTES, PRIORITY_NORMAL, SESSION_BYTES, MemoryBudget
+from router import AUTO_MODEL, LatencyRouter
+from triage import INFER, TriageStage
+
+
+EXIF_ORIENTATION = 0x0112
+
+
+class BackgroundRemover:
+    """Reusable entry point that owns model sessions, routing and triage.
+
+    Results are RGBA images; ``info["rembg_model"]`` records the model that
+    produced them, or the triage path that made the model unnecessary.
+    """
+
+    def __init__(self, model="u2net", budget=3.0, triage=True, prefetch=4, workers=2, memory=None,
+                 profiler=None):
+        if prefetch < 1 or workers < 1:
+            raise ValueError("prefetch and workers must be at least 1")
+        self.model = model
+        self.prefetch = prefetch
+        self.workers = workers
+        self.router = LatencyRouter(budget=budget)
+        self.triage = TriageStage() if triage else None
+        self.memory = memory or MemoryBudget()
+        self.profiler = profiler
+        self._sessions = {}
+        self._warm = set()
+        self._lock = threading.Lock()
+
+    def session(self, model_name):
+        # Loading an ONNX model is expensive, keep one session per model around
+        key = ("session", id(self), model_name)
+        with self._lock:
+            session = self._sessions.get(model_name)
+            created = session is None
+            if created:
+                session = self.profiler.new_session(model_name) if self.profiler else new_session(model_name)
+                self._sessions[model_name] = session
+        if created:
+            # Idle models are unloaded least recently used first when memory runs short
+            self.memory.register(key, SESSION_BYTES.get(model_name, DEFAULT_SESSION_BYTES),
+                                 PRIORITY_NORMAL, lambda: self.unload(model_name))
+        else:
+            self.memory.touch(key)
+        return session
+
+    def unload(self, model_name):
+        # A run already holding the session keeps it alive until it finishes
+        with self._lock:
+            session = self._sessions.pop(model_name, None)
+            self._warm.discard(model_name)
+        self.memory.release(("session", id(self), model_name))
+        if session is not None and self.profiler:
+            # Profiling data lives in the session, flush it before it goes away
+            self.profiler.collect(model_name, session)
+
+    def finish_profiling(self):
+        if not self.profiler:
+            return {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+            self._sessions.clear()
+            self._warm.clear()
+        for model_name, session in sessions:
+            self.memory.release(("session", id(self), model_name))
+            self.profiler.collect(model_name, session)
+        return self.profiler.finish()
+
+    @staticmethod
+    def load(image):
+        if isinstance(image, Image.Image):
+            img = image
+        else:
+            if isinstance(image, (bytes, bytearray)):
+                image = io.BytesIO(image)
+            elif isinstance(image, (str, Path)):
+                image = Path(image)
+            img = Image.open(image)
+            img.load()
+        # rembg rotates by EXIF inside remove(), do it up front so triage fast paths,
+        # cached masks and touch-up crops all share the model's orientation
+        if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            img = ImageOps.exif_transpose(img)
+        return img
+
+    def remove(self, image, model=None, queue_depth=0):
+        img = self.load(image)
+        model_name = model or self.model
+
+        decision = self.triage.check(img, model_name) if self.triage else None
+        if decision is not None and decision.kind != INFER:
+            decision.result.info["rembg_model"] = decision.kind
+            return decision.result
+
+        if model_name == AUTO_MODEL:
+            model_name = self.router.choose(img.size, queue_depth=queue_depth)
+
+        session = self.session(model_name)
+        with self._lock:
+            warmup = model_name not in self._warm
+            self._warm.add(model_name)
+        with self.profiler.tagged(model_name) if self.profiler else nullcontext():
+            start = time.perf_counter()
+            result = remove(img, session=session)
+            self.router.record(model_name, img.size, time.perf_counter() - start, warmup=warmup)
+        result.info["rembg_model"] = model_name
+        if decision is not None:
+            self.triage.store(decision.key, decision.digest, result)
+        return result
+
+    def remove_many(self, images, model=None):
+        """Yield results in input order, with at most ``prefetch`` images in flight."""
+        iterator = iter(images)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                for image in iterator:
+                    # Work already queued ahead of this image, spread over the workers
+                    depth = len(pending) // self.workers
+                    pending.append(pool.submit(self.remove, image, model, depth))
+                    if len(pending) >= self.prefetch:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # Consumer stopped early, drop whatever has not started yet
+                for future in pending:
+                    future.cancel()
+
+    def metrics(self):
+        return {
+            "router": self.router.metrics(),
+            "triage": self.triage.metrics() if self.triage else None,
+            "memory": self.memory.metrics(),
+        }
@@ -0,0 +1,138 @@
+import threading
+
+
+AUTO_MODEL = "auto"
+
+# General purpose models, best quality first
+AUTO_CANDIDATES = ["isnet-general-use", "u2net", "u2netp"]
+
+# Prior cost curves as (fixed seconds, seconds per megapixel) until real runs come in
+DEFAULT_COSTS = {
+    "isnet-general-use": (1.6, 0.10),
+    "u2net": (1.1, 0.10),
+    "u2netp": (0.35, 0.08),
+}
+
+
+class CostCurve:
+    """Online linear fit of latency over image megapixels, decayed so recent runs count more.
+
+    The prior is folded in as ``prior_weight`` pseudo-observations, so one
+    outlier shifts the curve instead of replacing it.
+    """
+
+    def __init__(self, base, per_mp, decay=0.9, prior_weight=3.0):
+        self.base = base
+        self.per_mp = per_mp
+        self.decay = decay
+        self.samples = 0
+        self._n = self._sx = self._sy = self._sxx = self._sxy = 0.0
+        # Spread over two sizes so the prior carries its slope as well as its intercept
+        for megapixels in (1.0, 12.0):
+            self._add(megapixels, base + per_mp * megapixels, prior_weight / 2)
+
+    def _add(self, megapixels, seconds, weight=1.0):
+        self._n += weight
+        self._sx += weight * megapixels
+        self._sy += weight * seconds
+        self._sxx += weight * megapixels * megapixels
+        self._sxy += weight * megapixels * seconds
+
+    def predict(self, megapixels):
+        return max(0.0, self.base + self.per_mp * megapixels)
+
+    def observe(self, megapixels, seconds):
+        d = self.decay
+        self._n *= d
+        self._sx *= d
+        self._sy *= d
+        self._sxx *= d
+        self._sxy *= d
+        self._add(megapixels, seconds)
+        self.samples += 1
+
+        var = self._n * self._sxx - self._sx * self._sx
+        if var > 1e-9:
+            self.per_mp = max(0.0, (self._n * self._sxy - self._sx * self._sy) / var)
+        # Sizes too similar to fit a slope: keep the slope, refit the intercept
+        self.base = (self._sy - self.per_mp * self._sx) / self._n
+
+
+class LatencyRouter:
+    """Picks the best quality model whose predicted latency fits the budget.
+
+    Every ``probe_every`` idle decisions the next better model than the one
+    that fits is tried once, so a curve that was pushed too high can recover.
+    """
+
+    def __init__(self, budget=3.0, candidates=None, costs=None, probe_every=25):
+        self.budget = budget
+        self.probe_every = probe_every
+        self.candidates = list(candidates or AUTO_CANDIDATES)
+        costs = dict(DEFAULT_COSTS, **(costs or {}))
+        self.curves = {name: CostCurve(*costs[name]) for name in self.candidates}
+        self._lock = threading.Lock()
+        self._decisions = {name: 0 for name in self.candidates}
+        self._over_budget = 0
+        self._deadline_misses = 0
+        self._runs = 0
+        self._warmups = 0
+        self._probes = 0
+        self._idle_choices = 0
+
+    def choose(self, size, queue_depth=0, budget=None):
+        budget = self.budget if budget is None else budget
+        megapixels = size[0] * size[1] / 1_000_000
+
+        with self._lock:
+            choice = None
+            for name in self.candidates:
+                cost = self.curves[name].predict(megapixels)
+                # Everything already queued runs before us, assume at the same cost
+                if cost * (queue_depth + 1) <= budget:
+                    choice = name
+                    break
+            if choice is None:
+                # Nothing fits, degrade to the fastest model
+                choice = min(self.candidates, key=lambda n: self.curves[n].predict(megapixels))
+                self._over_budget += 1
+            if queue_depth == 0 and self.probe_every:
+                # Only probe with nothing queued behind us, one tier up at a time
+                self._idle_choices += 1
+                rank = self.candidates.index(choice)
+                if rank > 0 and self._idle_choices % self.probe_every == 0:
+                    choice = self.candidates[rank - 1]
+                    self._probes += 1
+            self._decisions[choice] += 1
+        return choice
+
+    def record(self, model_name, size, seconds, budget=None, warmup=False):
+        if model_name not in self.curves:
+            return
+        budget = self.budget if budget is None else budget
+        megapixels = size[0] * size[1] / 1_000_000
+        with self._lock:
+            # A session's first run pays ONNX Runtime's one-off setup, it says nothing about steady state
+            if warmup:
+                self._warmups += 1
+            else:
+                self.curves[model_name].observe(megapixels, seconds)
+            self._runs += 1
+            if seconds > budget:
+                self._deadline_misses += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "budget_s": self.budget,
+                "decisions": dict(self._decisions),
+                "over_budget": self._over_budget,
+                "deadline_misses": self._deadline_misses,
+                "runs": self._runs,
+                "warmups": self._warmups,
+                "probes": self._probes,
+                "curves": {
+                    name: {"base_s": round(c.base, 4), "per_mp_s": round(c.per_mp, 4), "samples": c.samples}
+                    for name, c in self.curves.items()
+                },
+            }
@@ -0,0 +1,145 @@
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtGui import QImage, QImageIOHandler, QImageReader, QTransform
+
+
+# APP1 segments are capped at 64 KB and come right after SOI, this always covers them
+EXIF_SCAN_BYTES = 128 * 1024
+CACHE_SIZE = 32
+
+# EXIF orientation -> clockwise rotation, mirrored orientations are left to Qt
+EXIF_ROTATIONS = {1: 0, 3: 180, 6: 90, 8: 270}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _parse_exif(tiff):
+    endian = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if endian is None:
+        return None, 1
+
+    def read_ifd(offset):
+        count = struct.unpack_from(endian + "H", tiff, offset)[0]
+        entries = {}
+        for i in range(count):
+            tag, _, _, value = struct.unpack_from(endian + "HHI4s", tiff, offset + 2 + 12 * i)
+            entries[tag] = value
+        return entries, struct.unpack_from(endian + "I", tiff, offset + 2 + 12 * count)[0]
+
+    ifd0, ifd1_offset = read_ifd(struct.unpack_from(endian + "I", tiff, 4)[0])
+    orientation = struct.unpack(endian + "H", ifd0[0x0112][:2])[0] if 0x0112 in ifd0 else 1
+    if not ifd1_offset:
+        return None, orientation
+
+    ifd1, _ = read_ifd(ifd1_offset)
+    if 0x0201 not in ifd1 or 0x0202 not in ifd1:
+        return None, orientation
+    start = struct.unpack(endian + "I", ifd1[0x0201])[0]
+    length = struct.unpack(endian + "I", ifd1[0x0202])[0]
+    data = tiff[start:start + length]
+    return (data if data[:2] == b"\xff\xd8" and len(data) == length else None), orientation
+
+
+def exif_thumbnail(path):
+    """Return (jpeg bytes or None, orientation) from the EXIF IFD1 of a JPEG file."""
+    with open(path, "rb") as f:
+        head = f.read(EXIF_SCAN_BYTES)
+    if head[:2] != b"\xff\xd8":
+        return None, 1
+
+    pos = 2
+    try:
+        while pos + 4 <= len(head) and head[pos] == 0xFF:
+            marker = head[pos + 1]
+            if marker in (0xD9, 0xDA):
+                break
+            length = struct.unpack_from(">H", head, pos + 2)[0]
+            if marker == 0xE1 and head[pos + 4:pos + 10] == b"Exif\0\0":
+                return _parse_exif(head[pos + 10:pos + 2 + length])
+            pos += 2 + length
+    except (struct.error, KeyError):
+        pass
+    return None, 1
+
+
+def _from_exif(path, width, full_size):
+    data, orientation = exif_thumbnail(path)
+    if data is None or orientation not in EXIF_ROTATIONS:
+        return None
+    image = QImage.fromData(data, "JPEG")
+    if image.isNull():
+        return None
+    if EXIF_ROTATIONS[orientation]:
+        image = image.transformed(QTransform().rotate(EXIF_ROTATIONS[orientation]))
+    if EXIF_ROTATIONS[orientation] in (90, 270):
+        full_size = full_size.transposed()
+    # Too small, or letterboxed to a different aspect than the real photo
+    if image.width() < width:
+        return None
+    if abs(image.width() / image.height() - full_size.width() / full_size.height()) > 0.02:
+        return None
+    return image
+
+
+def _cache_key(path, width):
+    # mtime and size in the key so an edited file never shows a stale thumbnail
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, width)
+
+
+def read_thumbnail(path, width):
+    """Decode path straight to a QImage about width pixels wide, without a full-size decode.
+
+    Safe to call off the GUI thread; results are kept in a small LRU cache.
+    """
+    key = _cache_key(path, width)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    image = None
+    if size.isValid() and size.width() > 0 and size.height() > 0:
+        if bytes(reader.format()) == b"jpeg":
+            image = _from_exif(path, width, size)
+        if image is None:
+            # Scaling is applied before the EXIF rotation, so target the side that ends up horizontal
+            rotated = bool(reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90)
+            side, other = (size.height(), size.width()) if rotated else (size.width(), size.height())
+            if side > width:
+                scaled = QSize(width, max(1, round(other * width / side)))
+                reader.setScaledSize(scaled.transposed() if rotated else scaled)
+    if image is None:
+        image = reader.read()
+        if image.isNull():
+            raise ValueError(reader.errorString())
+
+    if image.width() != width:
+        image = image.scaledToWidth(width, Qt.TransformationMode.SmoothTransformation)
+
+    with _lock:
+        _cache[key] = image
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return image
+
+
+def cached_thumbnail(path, width):
+    try:
+        key = _cache_key(path, width)
+    except OSError:
+        return None
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+        return cached
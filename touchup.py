@@ -0,0 +1,47 @@
+import numpy as np
+from PIL import Image
+from rembg import remove
+
+
+def expand_box(box, size, margin=0.25, min_side=64):
+    # Grow the marked region so the model sees enough context around it
+    x0, y0, x1, y1 = box
+    pad_x = max(int((x1 - x0) * margin), (min_side - (x1 - x0)) // 2, 0)
+    pad_y = max(int((y1 - y0) * margin), (min_side - (y1 - y0)) // 2, 0)
+    return (max(0, x0 - pad_x), max(0, y0 - pad_y),
+            min(size[0], x1 + pad_x), min(size[1], y1 + pad_y))
+
+
+def _ramp(length, inner_start, inner_end):
+    # 1 inside the marked span, falling linearly to 0 at the crop edges
+    pos = np.arange(length, dtype=np.float32) + 0.5
+    rise = np.clip(pos / max(inner_start, 1), 0, 1)
+    fall = np.clip((length - pos) / max(length - inner_end, 1), 0, 1)
+    return np.minimum(rise, fall)
+
+
+def refine_region(img, mask, box, session, margin=0.25):
+    """Re-infer only a crop around box and blend it into the existing mask."""
+    x0, y0, x1, y1 = box
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError("Touch-up region is empty")
+
+    crop_box = expand_box(box, img.size, margin)
+    cx0, cy0, cx1, cy1 = crop_box
+    # The model input is a fixed size, so a small crop gets far more detail than the full frame did
+    crop_mask = remove(img.crop(crop_box).convert("RGB"), session=session, only_mask=True)
+
+    weights = np.outer(
+        _ramp(cy1 - cy0, y0 - cy0, y1 - cy0),
+        _ramp(cx1 - cx0, x0 - cx0, x1 - cx0),
+    )
+    # Only the crop goes through float, the rest of the mask is copied as bytes
+    old = np.asarray(mask.crop(crop_box), dtype=np.float32)
+    new = np.asarray(crop_mask, dtype=np.float32)
+    blended = old + (new - old) * weights
+
+    new_mask = mask.copy()
+    new_mask.paste(Image.fromarray(blended.round().astype(np.uint8), "L"), crop_box[:2])
+    result = img.convert("RGBA")
+    result.putalpha(new_mask)
+    return new_mask, result
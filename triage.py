@@ -0,0 +1,149 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+
+
+INFER = "infer"
+ALPHA = "alpha"
+COLOR_KEY = "color_key"
+DUPLICATE = "duplicate"
+
+Decision = namedtuple("Decision", ["kind", "result", "key", "digest"], defaults=(None, None))
+
+
+def dhash(img, hash_size=8):
+    # Difference hash over a tiny grayscale thumbnail, 64 bits for the default size
+    small = np.asarray(img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+
+def digest(img):
+    # Exact identity only, not security; sha1 is the fastest hashlib option on big buffers
+    h = hashlib.sha1(img.mode.encode(), usedforsecurity=False)
+    h.update(img.tobytes())
+    return h.digest()
+
+
+def has_alpha(img, min_transparent=0.005):
+    if img.mode not in ("RGBA", "LA", "PA") and "transparency" not in img.info:
+        return False
+    alpha = np.asarray(img.convert("RGBA").getchannel("A"))
+    # Fully opaque alpha channels are common in PNG exports and mean nothing
+    return np.count_nonzero(alpha < 250) >= alpha.size * min_transparent
+
+
+def border_key(img, border=4, tolerance=12):
+    # Uniform border colour means a studio style backdrop we can key out directly.
+    # Only the four edge strips are decoded to RGB, never the whole frame
+    width, height = img.size
+    strips = [(0, 0, width, border), (0, height - border, width, height),
+              (0, 0, border, height), (width - border, 0, width, height)]
+    edges = np.concatenate([
+        np.asarray(img.crop(box).convert("RGB")).reshape(-1, 3) for box in strips
+    ]).astype(np.int16)
+    key = np.median(edges, axis=0)
+    if np.abs(edges - key).max() > tolerance:
+        return None
+    return key
+
+
+def border_connected(near):
+    # Only backdrop-coloured regions touching the frame count, so interior areas
+    # that merely share the colour (a white label on a white sweep) stay opaque
+    labels, _ = ndimage.label(near)
+    edge_labels = np.unique(np.concatenate([labels[0], labels[-1], labels[:, 0], labels[:, -1]]))
+    return np.isin(labels, edge_labels[edge_labels != 0])
+
+
+def color_key_cutout(img, rgb, key, tolerance=12):
+    key = key.round().astype(np.int16)
+    dist = np.abs(rgb[..., 0].astype(np.int16) - key[0])
+    for c in (1, 2):
+        np.maximum(dist, np.abs(rgb[..., c].astype(np.int16) - key[c]), out=dist)
+    # Soft ramp over one tolerance width past the key so edges are not jagged
+    ramp = np.clip(dist - tolerance, 0, tolerance) * 255 // tolerance
+    alpha = np.where(border_connected(ramp < 255), ramp, 255).astype(np.uint8)
+    result = img.convert("RGBA")
+    result.putalpha(Image.fromarray(alpha, "L"))
+    return result
+
+
+class TriageStage:
+    """Cheap checks run before inference so trivial inputs skip the model.
+
+    Duplicates are found by dHash and confirmed with an exact pixel digest;
+    only the cached alpha is reused, applied to the current image's own pixels.
+    """
+
+    def __init__(self, border=4, tolerance=12, cache_bytes=256 << 20):
+        self.border = border
+        self.tolerance = tolerance
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {INFER: 0, ALPHA: 0, COLOR_KEY: 0, DUPLICATE: 0}
+
+    def check(self, img, model_name=None):
+        if has_alpha(img):
+            return self._decide(ALPHA, img.convert("RGBA"))
+
+        key = (dhash(img), img.size, model_name)
+        # Computed once here and carried in the Decision, store() reuses it
+        img_digest = digest(img)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and cached[0] == img_digest:
+            with self._lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+            result = img.convert("RGBA")
+            result.putalpha(cached[1])
+            return self._decide(DUPLICATE, result, key, img_digest)
+
+        if min(img.size) > 2 * self.border:
+            colour = border_key(img, self.border, self.tolerance)
+            if colour is not None:
+                result = color_key_cutout(img, np.asarray(img.convert("RGB")), colour, self.tolerance)
+                self.store(key, img_digest, result)
+                return self._decide(COLOR_KEY, result, key, img_digest)
+
+        return self._decide(INFER, None, key, img_digest)
+
+    def store(self, key, img_digest, result):
+        if key is None or img_digest is None:
+            return
+        # Alpha only, one byte per pixel, and bounded in bytes rather than entries
+        alpha = result.getchannel("A")
+        nbytes = alpha.width * alpha.height
+        if nbytes > self.cache_bytes:
+            return
+        entry = (img_digest, alpha)
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._cached_bytes -= old[1].width * old[1].height
+            self._cache[key] = entry
+            self._cached_bytes += nbytes
+            while self._cached_bytes > self.cache_bytes:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted.width * evicted.height
+
+    def _decide(self, kind, result, key=None, img_digest=None):
+        with self._lock:
+            self._counts[kind] += 1
+        return Decision(kind, result, key, img_digest)
+
+    def metrics(self):
+        with self._lock:
+            counts = dict(self._counts)
+            cached_bytes = self._cached_bytes
+        total = sum(counts.values())
+        skipped = total - counts[INFER]
+        return dict(counts, total=total, skipped=skipped, cached_bytes=cached_bytes,
+                    skipped_ratio=round(skipped / total, 3) if total else 0.0)